@@ -1,13 +1,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from influxdb_client import InfluxDBClient
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from influxdb_client import InfluxDBClient, Dialect
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from datetime import datetime
-import time
 import os
+import io
+import math
 from dotenv import load_dotenv
 
+try:
+    from tsdownsample import MinMaxLTTBDownsampler
+except ImportError:
+    MinMaxLTTBDownsampler = None
+
 # -------------------------------------------------
 # CARGAR .env
 # -------------------------------------------------
@@ -22,6 +31,19 @@ if not all([INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET]):
     st.error("Faltan credenciales en el archivo .env")
     st.stop()
 
+MEASUREMENTS = ["studio-dht22", "mpu6050"]
+FIELDS = [
+    "temperatura", "humedad", "sensacion_termica",
+    "accel_x", "accel_y", "accel_z",
+    "gyro_x", "gyro_y", "gyro_z"
+]
+MEASUREMENT_FILTER = " or ".join(f'r._measurement == "{m}"' for m in MEASUREMENTS)
+FIELD_FILTER = " or ".join(f'r._field == "{f}"' for f in FIELDS)
+# Campos que usan las tarjetas en vivo (el giroscopio sólo se grafica)
+LIVE_FIELDS = ["temperatura", "humedad", "sensacion_termica", "accel_x", "accel_y", "accel_z"]
+LIVE_FILTER = " or ".join(f'r._field == "{f}"' for f in LIVE_FIELDS)
+CHART_POINTS = 1500  # ~ancho en píxeles de un gráfico
+
 # -------------------------------------------------
 # CONFIGURACIÓN DE PÁGINA
 # -------------------------------------------------
@@ -49,58 +71,302 @@ st.markdown("""
 # -------------------------------------------------
 @st.cache_resource
 def get_client():
-    return InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
+    return InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG, enable_gzip=True)
 
 client = get_client()
 query_api = client.query_api()
 
+# CSV plano (sin anotaciones) para decodificarlo con el lector C++ de pyarrow;
+# sólo se convierten las columnas útiles (se descartan "", result y table)
+# y los campos llegan directamente como float32 / _time como timestamp UTC
+CSV_DIALECT = Dialect(header=True, annotations=[])
+CSV_CONVERT = pa_csv.ConvertOptions(
+    include_columns=["_time"] + FIELDS,
+    include_missing_columns=True,
+    column_types={"_time": pa.timestamp("ns", tz="UTC"), **{field: pa.float32() for field in FIELDS}},
+    timestamp_parsers=[pa_csv.ISO8601]
+)
+
 # -------------------------------------------------
 # OBTENER DATOS
 # -------------------------------------------------
-@st.cache_data(ttl=60)
+# cache_resource: el frame se comparte sin copiarlo en cada rerun (sólo se lee)
+@st.cache_resource(ttl=60)
 def get_data(range_hours=24):
+    # Una sola consulta para ambos sensores, ya promediada por minuto en el servidor
+    # (cada fila lleva el inicio de su ventana, como resample).
+    # Filtrar los campos antes del pivot evita filas sin ningún campo útil
+    keep_columns = ", ".join(f'"{c}"' for c in ["_time"] + FIELDS)
     query = f'''
     from(bucket: "{INFLUXDB_BUCKET}")
       |> range(start: -{range_hours}h)
-      |> filter(fn: (r) => 
-          r._measurement == "studio-dht22" or 
-          r._measurement == "mpu6050"
-      )
+      |> filter(fn: (r) => {MEASUREMENT_FILTER})
+      |> filter(fn: (r) => {FIELD_FILTER})
+      |> aggregateWindow(every: 1m, fn: mean, timeSrc: "_start", createEmpty: false)
+      |> group()
       |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
-      |> keep(columns: [
-          "_time",
-          "temperatura", "humedad", "sensacion_termica",
-          "accel_x", "accel_y", "accel_z",
-          "gyro_x", "gyro_y", "gyro_z"
-      ])
+      |> keep(columns: [{keep_columns}])
+    '''
+    try:
+        # Una sola tabla (group) => un solo encabezado CSV para pyarrow
+        response = query_api.query_raw(query, org=INFLUXDB_ORG, dialect=CSV_DIALECT)
+        try:
+            # pyarrow lee la respuesta por bloques a medida que llega, sin copiar el cuerpo completo
+            response.auto_close = False
+            stream = io.BufferedReader(response)
+            if not stream.peek(1).strip():
+                return pd.DataFrame()
+            table = pa_csv.read_csv(stream, convert_options=CSV_CONVERT)
+        finally:
+            response.release_conn()
+        
+        df = table.to_pandas()
+        df = df.set_index("_time")
+        # Resolución de milisegundos: sobra para ventanas de 1 minuto. Flux recorta
+        # la primera ventana al inicio del range (now - N h, fuera de minuto):
+        # floor la devuelve a su minuto para que la grilla de asfreq quede alineada
+        df.index = df.index.as_unit("ms").floor("min")
+        # InfluxDB ya devuelve las filas ordenadas: ordenar sólo si hace falta
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind="mergesort")
+        # Grilla regular de 1 minuto: los cortes de un sensor quedan como NaN
+        # (huecos en los gráficos) y las ventanas móviles en muestras son minutos reales
+        return df.asfreq("min")
+    except Exception as e:
+        st.error(f"Error al consultar InfluxDB: {e}")
+        return pd.DataFrame()
+
+@st.cache_data(ttl=60)
+def get_latest(range_hours=24):
+    # Último valor de cada campo calculado en el servidor (pocas filas) y la hora
+    # de la muestra más reciente
+    query = f'''
+    from(bucket: "{INFLUXDB_BUCKET}")
+      |> range(start: -{range_hours}h)
+      |> filter(fn: (r) => {MEASUREMENT_FILTER})
+      |> filter(fn: (r) => {LIVE_FILTER})
+      |> last()
     '''
     try:
         result = query_api.query(org=INFLUXDB_ORG, query=query)
-        rows = []
+        # dict de floats ya validados: las tarjetas sólo hacen .get(campo, 0.0);
+        # los valores nulos o NaN se omiten y cuentan como faltantes
+        latest, last_time = {}, None
         for table in result:
             for rec in table.records:
-                row = {"_time": rec.get_time()}
-                for field in ["temperatura", "humedad", "sensacion_termica",
-                              "accel_x", "accel_y", "accel_z",
-                              "gyro_x", "gyro_y", "gyro_z"]:
-                    row[field] = rec.values.get(field)
-                rows.append(row)
-        
-        if not rows:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(rows)
-        df["_time"] = pd.to_datetime(df["_time"])
-        df = df.set_index("_time").sort_index()
-        
-        for c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-        
-        df = df.dropna(how="all")
-        return df
+                if last_time is None or rec.get_time() > last_time:
+                    last_time = rec.get_time()
+                val = rec.get_value()
+                if val is not None and not math.isnan(val):
+                    latest[rec.get_field()] = float(val)
+        return latest, last_time
     except Exception as e:
         st.error(f"Error al consultar InfluxDB: {e}")
-        return pd.DataFrame()
+        return {}, None
+
+# -------------------------------------------------
+# DOWNSAMPLING PARA GRÁFICOS (LTTB)
+# -------------------------------------------------
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets en NumPy: un punto por bucket, el que forma
+    # el triángulo de mayor área con el punto anterior y el promedio del siguiente bucket
+    n = len(x)
+    x = (x - x[0]).astype(np.float64)
+    y = y.astype(np.float64)
+    bucket = (n - 2) / (n_out - 2)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def downsample(t, y, n_out=CHART_POINTS):
+    # Reduce una serie (índice temporal t, valores y) a ~n_out puntos conservando
+    # picos y valles; las series cortas se devuelven intactas. Los huecos (NaN)
+    # se conservan para que Plotly corte la línea en los cortes de un sensor
+    if len(y) <= n_out:
+        return t, y
+    valid = ~np.isnan(y)
+    pos = np.flatnonzero(valid)
+    if len(pos) > n_out:
+        x, yv = t.asi8[pos], np.ascontiguousarray(y[pos])
+        if MinMaxLTTBDownsampler is not None:
+            sel = MinMaxLTTBDownsampler().downsample(x, yv, n_out=n_out)
+        else:
+            sel = lttb_indices(x, yv, n_out)
+        pos = pos[sel]
+    # Si entre dos puntos elegidos hay algún NaN, se agrega el primero como corte
+    gaps = np.flatnonzero(~valid)
+    if len(gaps) and len(pos) > 1:
+        nxt = np.searchsorted(gaps, pos[:-1])
+        cut = nxt < len(gaps)
+        cut[cut] = gaps[nxt[cut]] < pos[1:][cut]
+        pos = np.sort(np.concatenate([pos, gaps[nxt[cut]]]))
+    return t[pos], y[pos]
+
+
+def frame_arrays(df):
+    # Índice y columnas como ndarrays (vistas, sin copiar) para que los
+    # constructores de figuras trabajen sobre arrays en vez de Series
+    return df.index, {c: df[c].to_numpy() for c in df.columns}
+
+# -------------------------------------------------
+# ESTADÍSTICAS MÓVILES
+# -------------------------------------------------
+def rolling_mean_std(x, w):
+    # Media y desvío móviles (ddof=1, min_periods=1) sobre ventanas de w muestras,
+    # en O(n) con sumas acumuladas; los NaN no cuentan. Opera por columnas si x es 2-D
+    x = np.asarray(x, dtype=np.float64)
+    valid = ~np.isnan(x)
+    # Centrar cada columna reduce la cancelación numérica en s2 - s1²/n
+    shift = np.where(valid, x, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    xc = np.where(valid, x - shift, 0.0)
+
+    def window_sum(v):
+        c = np.cumsum(v, axis=0)
+        c[w:] = c[w:] - c[:-w]
+        return c
+
+    n = window_sum(valid.astype(np.float64))
+    s1 = window_sum(xc)
+    s2 = window_sum(xc * xc)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / n + shift
+        var = (s2 - s1 * s1 / n) / (n - 1)
+    std = np.where(n >= 2, np.sqrt(np.maximum(var, 0.0)), np.nan)
+    return mean, std
+
+# -------------------------------------------------
+# FIGURAS (MEMOIZADAS)
+# -------------------------------------------------
+def frame_key(d):
+    # Huella barata del frame (tamaño y extremos del índice) en lugar de hashear todo su contenido
+    if d.empty:
+        return (0,)
+    return (len(d), d.index[0].value, d.index[-1].value)
+
+FRAME_HASH = {pd.DataFrame: frame_key}
+
+# Estilos fijos de las figuras: se arman una sola vez al cargar el módulo
+SENSORES_LAYOUT = dict(
+    height=900,
+    hovermode="x unified",
+    legend=dict(orientation="h", yanchor="bottom", y=1.04, xanchor="right", x=1)
+)
+ACC_TRACES = {"accel_x": ("Aceleración X", dict(color="red")),
+              "accel_y": ("Aceleración Y", dict(color="green")),
+              "accel_z": ("Aceleración Z", dict(color="blue"))}
+GYR_TRACES = {"gyro_x": ("Giro X", dict(color="purple")),
+              "gyro_y": ("Giro Y", dict(color="orange")),
+              "gyro_z": ("Giro Z", dict(color="cyan"))}
+PROMEDIO_LINE = dict(dash="dash")
+ANOMALIA_MARKER = dict(color="red", size=8)
+# Sin barra de herramientas ni tema de Streamlit: menos trabajo de Plotly.js al dibujar
+# (doble clic sigue restableciendo el zoom)
+PLOTLY_CONFIG = {"displayModeBar": False, "responsive": True}
+
+
+@st.cache_data(ttl=60, hash_funcs=FRAME_HASH, show_spinner=False)
+def build_fig_sensores(df):
+    # DHT22, aceleración y giroscopio en una sola figura con eje X compartido
+    fig = make_subplots(
+        rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05,
+        specs=[[{"secondary_y": True}], [{}], [{}]],
+        subplot_titles=(
+            "DHT22: Temperatura, Humedad y Sensación Térmica",
+            "MPU6050: Aceleración (g)",
+            "MPU6050: Giro (°/s)"
+        )
+    )
+
+    t, cols = frame_arrays(df)
+
+    # DHT22
+    if "temperatura" in cols:
+        x, y = downsample(t, cols["temperatura"])
+        fig.add_trace(go.Scattergl(x=x, y=y, name="Temperatura", line=dict(color="red")), row=1, col=1)
+    if "humedad" in cols:
+        x, y = downsample(t, cols["humedad"])
+        fig.add_trace(go.Scattergl(x=x, y=y, name="Humedad", line=dict(color="blue")),
+                      row=1, col=1, secondary_y=True)
+    if "sensacion_termica" in cols:
+        x, y = downsample(t, cols["sensacion_termica"])
+        fig.add_trace(go.Scattergl(x=x, y=y, name="Sensación Térmica", line=dict(color="orange", dash="dot")),
+                      row=1, col=1)
+
+    # MPU6050 – Aceleración y giroscopio
+    for row, traces in ((2, ACC_TRACES), (3, GYR_TRACES)):
+        for col, (name, line) in traces.items():
+            if col in cols:
+                x, y = downsample(t, cols[col])
+                fig.add_trace(go.Scattergl(x=x, y=y, name=name, line=line), row=row, col=1)
+
+    fig.update_yaxes(title_text="Temperatura (°C)", row=1, col=1, secondary_y=False)
+    fig.update_yaxes(title_text="Humedad (%)", row=1, col=1, secondary_y=True)
+    fig.update_yaxes(title_text="Aceleración (g)", row=2, col=1)
+    fig.update_yaxes(title_text="Giro (°/s)", row=3, col=1)
+    fig.update_layout(**SENSORES_LAYOUT)
+    return fig
+
+
+@st.cache_data(ttl=60, hash_funcs=FRAME_HASH, show_spinner=False)
+def build_predictive(df, window):
+    # Devuelve (fig_temp, fig_vib, cantidad de anomalías) para la ventana dada.
+    # df viene en una grilla de 1 minuto, así que la ventana en minutos es
+    # directamente una cantidad de muestras
+
+    t, cols = frame_arrays(df)
+
+    # Temperatura
+    temp = cols.get("temperatura", np.full(len(t), np.nan))
+
+    # Vibración RMS
+    accel_cols = [c for c in ["accel_x", "accel_y", "accel_z"] if c in cols]
+    vib = np.zeros(len(t))
+    if accel_cols:
+        # Cuadrado + suma por fila en una sola pasada (sin matriz intermedia)
+        acc = np.column_stack([cols[c] for c in accel_cols])
+        vib = np.sqrt(np.einsum("ij,ij->i", acc, acc))
+
+    # Ambos canales apilados: una sola pasada de estadísticas móviles y de z-score
+    X = np.column_stack([temp, vib])
+    ma, sd = rolling_mean_std(X, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mask = np.abs(X - ma) / sd > 2.5
+    mask_temp, mask_vib = mask[:, 0], mask[:, 1]
+
+    fig_temp = go.Figure()
+    if "temperatura" in cols:
+        x, y = downsample(t, temp)
+        fig_temp.add_trace(go.Scattergl(x=x, y=y, name="Real"))
+        x, y = downsample(t, ma[:, 0])
+        fig_temp.add_trace(go.Scattergl(x=x, y=y, name="Promedio", line=PROMEDIO_LINE))
+        if mask_temp.any():
+            # Posiciones de las anomalías: se indexan directamente los arrays, sin sub-frames
+            pos = np.flatnonzero(mask_temp)
+            fig_temp.add_trace(go.Scattergl(x=t[pos], y=temp[pos],
+                                            mode="markers", name="Anomalía", marker=ANOMALIA_MARKER))
+    fig_temp.update_layout(title=f"Temperatura – Ventana {window} min")
+
+    fig_vib = go.Figure()
+    x, y = downsample(t, vib)
+    fig_vib.add_trace(go.Scattergl(x=x, y=y, name="RMS Real"))
+    x, y = downsample(t, ma[:, 1])
+    fig_vib.add_trace(go.Scattergl(x=x, y=y, name="Promedio", line=PROMEDIO_LINE))
+    if mask_vib.any():
+        pos = np.flatnonzero(mask_vib)
+        fig_vib.add_trace(go.Scattergl(x=t[pos], y=vib[pos],
+                                        mode="markers", name="Anomalía", marker=ANOMALIA_MARKER))
+    fig_vib.update_layout(title=f"Vibración RMS – Ventana {window} min")
+
+    return fig_temp, fig_vib, int(mask_temp.sum() + mask_vib.sum())
 
 # -------------------------------------------------
 # TÍTULO
@@ -116,6 +382,8 @@ with st.sidebar:
     auto_refresh = st.checkbox("Auto-refresh cada 30s", value=True)
     if st.button("Recargar datos"):
         st.cache_data.clear()
+        get_data.clear()
+        st.session_state.pop("last_seen", None)
         st.success("Datos recargados")
 
 # -------------------------------------------------
@@ -128,174 +396,113 @@ if df.empty:
     st.warning("No se encontraron datos en el rango seleccionado.")
     st.stop()
 
-df_resampled = df.resample("1min").mean()
-
 # -------------------------------------------------
-# MÉTRICAS EN VIVO (100% FUNCIONAL)
+# SECCIÓN EN VIVO: MÉTRICAS + GRÁFICOS DHT22/MPU6050
 # -------------------------------------------------
-st.markdown("## Métricas en Tiempo Real")
-
-# Última hora de medición
-last_time = df.index.max()
-if pd.notna(last_time):
-    st.caption(f"Última medición: {last_time.strftime('%d/%m %H:%M:%S')}")
-else:
-    st.caption("Sin datos disponibles")
-
-cols = st.columns(4)
-metrics = [
-    ("Temperatura", "temperatura", "°C", (20, 40), (15, 45)),
-    ("Humedad", "humedad", "%", (30, 70), (20, 80)),
-    ("Sensación Térmica", "sensacion_termica", "°C", (20, 45), (15, 50)),
-    ("Vibración RMS", None, "g", (0, 1.0), (0, 1.5))
-]
+# Con auto-refresh sólo los fragmentos (sección en vivo, análisis predictivo y
+# footer) se vuelven a ejecutar cada 30s; el resumen y la barra lateral no
+refresh_every = "30s" if auto_refresh else None
+
 
-for i, (lbl, field, unit, good, warn) in enumerate(metrics):
-    with cols[i]:
-        if field:
-            if field in df.columns:
-                series = df[field].dropna()
-                val = series.iloc[-1] if not series.empty else 0.0
+@st.fragment(run_every=refresh_every)
+def live_section(range_hours):
+    df = get_data(range_hours)
+    latest, last_time = get_latest(range_hours)
+    if df.empty:
+        st.warning("No se encontraron datos en el rango seleccionado.")
+        return
+
+    # Métricas en vivo
+    st.markdown("## Métricas en Tiempo Real")
+
+    # Última hora de medición
+    if last_time is None:
+        last_time = df.index.max()
+    if pd.notna(last_time):
+        st.caption(f"Última medición: {last_time.strftime('%d/%m %H:%M:%S')}")
+    else:
+        st.caption("Sin datos disponibles")
+
+    # Escalares calculados una sola vez, fuera del bucle de tarjetas
+    # Norma del último vector de aceleración; un eje sin dato no suma
+    acc = np.array([latest.get(c, np.nan) for c in ("accel_x", "accel_y", "accel_z")])
+    vib_last = float(np.sqrt(np.nansum(acc * acc)))
+
+    cols = st.columns(4)
+    metrics = [
+        ("Temperatura", "temperatura", "°C", (20, 40), (15, 45)),
+        ("Humedad", "humedad", "%", (30, 70), (20, 80)),
+        ("Sensación Térmica", "sensacion_termica", "°C", (20, 45), (15, 50)),
+        ("Vibración RMS", None, "g", (0, 1.0), (0, 1.5))
+    ]
+
+    for i, (lbl, field, unit, good, warn) in enumerate(metrics):
+        with cols[i]:
+            val = round(latest.get(field, 0.0) if field else vib_last, 2)
+
+            if good[0] <= val <= good[1]:
+                st_class, status = "status-good", "Normal"
+            elif warn[0] <= val <= warn[1]:
+                st_class, status = "status-warning", "Advertencia"
             else:
-                val = 0.0
-        else:
-            accel_cols = ["accel_x", "accel_y", "accel_z"]
-            values = []
-            for col in accel_cols:
-                if col in df.columns:
-                    series = df[col].dropna()
-                    if not series.empty:
-                        values.append(series.iloc[-1]**2)
-            val = np.sqrt(sum(values)) if values else 0.0
-        
-        val = round(float(val), 2)
+                st_class, status = "status-critical", "Crítico"
 
-        if good[0] <= val <= good[1]:
-            st_class, status = "status-good", "Normal"
-        elif warn[0] <= val <= warn[1]:
-            st_class, status = "status-warning", "Advertencia"
-        else:
-            st_class, status = "status-critical", "Crítico"
-        
-        st.metric(lbl, f"{val} {unit}")
-        st.markdown(f'<div class="{st_class}">{status}</div>', unsafe_allow_html=True)
-# -------------------------------------------------
-# GRÁFICO DHT22
-# -------------------------------------------------
-st.markdown("## DHT22 – Condiciones Ambientales")
-fig_dht = go.Figure()
-
-if "temperatura" in df_resampled.columns:
-    fig_dht.add_trace(go.Scatter(x=df_resampled.index, y=df_resampled["temperatura"],
-                                 name="Temperatura", line=dict(color="red")))
-if "humedad" in df_resampled.columns:
-    fig_dht.add_trace(go.Scatter(x=df_resampled.index, y=df_resampled["humedad"],
-                                 name="Humedad", yaxis="y2", line=dict(color="blue")))
-if "sensacion_termica" in df_resampled.columns:
-    fig_dht.add_trace(go.Scatter(x=df_resampled.index, y=df_resampled["sensacion_termica"],
-                                 name="Sensación Térmica", line=dict(color="orange", dash="dot")))
-
-fig_dht.update_layout(
-    title="DHT22: Temperatura, Humedad y Sensación Térmica",
-    yaxis=dict(title="Temperatura (°C)"),
-    yaxis2=dict(title="Humedad (%)", overlaying="y", side="right"),
-    hovermode="x unified",
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-)
-st.plotly_chart(fig_dht, use_container_width=True)
+            st.metric(lbl, f"{val} {unit}")
+            st.markdown(f'<div class="{st_class}">{status}</div>', unsafe_allow_html=True)
 
-# -------------------------------------------------
-# GRÁFICO ACELERACIÓN
-# -------------------------------------------------
-st.markdown("## MPU6050 – Aceleración")
-fig_acc = go.Figure()
-colors_acc = {"accel_x": "red", "accel_y": "green", "accel_z": "blue"}
-labels = {"accel_x": "X", "accel_y": "Y", "accel_z": "Z"}  # Definido aquí
-
-for col in ["accel_x", "accel_y", "accel_z"]:
-    if col in df_resampled.columns:
-        fig_acc.add_trace(go.Scatter(
-            x=df_resampled.index, y=df_resampled[col],
-            name=f"Aceleración {labels[col]}",
-            line=dict(color=colors_acc[col])
-        ))
-
-fig_acc.update_layout(title="Aceleración (g)", hovermode="x unified")
-st.plotly_chart(fig_acc, use_container_width=True)
+    # Gráficos DHT22 + MPU6050
+    st.markdown("## Sensores – DHT22 y MPU6050")
+    st.plotly_chart(build_fig_sensores(df), use_container_width=True, theme=None, config=PLOTLY_CONFIG)
 
-# -------------------------------------------------
-# GRÁFICO GIROSCOPIO (CORREGIDO)
-# -------------------------------------------------
-st.markdown("## MPU6050 – Giroscopio")
-fig_gyr = go.Figure()
-colors_gyr = {"gyro_x": "purple", "gyro_y": "orange", "gyro_z": "cyan"}
-labels = {"gyro_x": "X", "gyro_y": "Y", "gyro_z": "Z"}  # Re-definido aquí
-
-for col in ["gyro_x", "gyro_y", "gyro_z"]:
-    if col in df_resampled.columns:
-        fig_gyr.add_trace(go.Scatter(
-            x=df_resampled.index, y=df_resampled[col],
-            name=f"Giro {labels[col]}",  # Ahora labels existe
-            line=dict(color=colors_gyr[col])
-        ))
-
-fig_gyr.update_layout(title="Giro (°/s)", hovermode="x unified")
-st.plotly_chart(fig_gyr, use_container_width=True)
+
+live_section(range_hours)
 
 # -------------------------------------------------
 # ANÁLISIS PREDICTIVO
 # -------------------------------------------------
-st.markdown("## Análisis Predictivo")
-window = st.slider("Ventana promedio móvil (min)", 5, 60, 15, key="predict_window")
-df_ma = df_resampled.rolling(f"{window}T").mean()
-df_std = df_resampled.rolling(f"{window}T").std()
-
-# Temperatura
-mask_temp = pd.Series([False] * len(df_resampled), index=df_resampled.index)
-if "temperatura" in df_resampled.columns:
-    upper = df_ma["temperatura"] + 2.5 * df_std["temperatura"]
-    lower = df_ma["temperatura"] - 2.5 * df_std["temperatura"]
-    mask_temp = (df_resampled["temperatura"] > upper) | (df_resampled["temperatura"] < lower)
-
-# Vibración RMS
-accel_cols = [c for c in ["accel_x", "accel_y", "accel_z"] if c in df_resampled.columns]
-vib_rms = pd.Series(0.0, index=df_resampled.index)
-if accel_cols:
-    vib_rms = np.sqrt((df_resampled[accel_cols]**2).sum(axis=1))
-
-ma_vib = vib_rms.rolling(f"{window}T").mean()
-std_vib = vib_rms.rolling(f"{window}T").std()
-mask_vib = (vib_rms > ma_vib + 2.5*std_vib) | (vib_rms < ma_vib - 2.5*std_vib)
-
-col1, col2 = st.columns(2)
-with col1:
-    fig_temp = go.Figure()
-    if "temperatura" in df_resampled.columns:
-        fig_temp.add_trace(go.Scatter(x=df_resampled.index, y=df_resampled["temperatura"], name="Real"))
-        fig_temp.add_trace(go.Scatter(x=df_ma.index, y=df_ma["temperatura"], name="Promedio", line=dict(dash="dash")))
-        if mask_temp.any():
-            fig_temp.add_trace(go.Scatter(x=df_resampled[mask_temp].index, y=df_resampled[mask_temp]["temperatura"],
-                                          mode="markers", name="Anomalía", marker=dict(color="red", size=8)))
-    fig_temp.update_layout(title=f"Temperatura – Ventana {window} min")
-    st.plotly_chart(fig_temp, use_container_width=True)
+# Fragmento propio: se refresca con los datos nuevos y mover la ventana
+# sólo vuelve a ejecutar esta sección
+@st.fragment(run_every=refresh_every)
+def predictive_section(range_hours):
+    df = get_data(range_hours)
+    if df.empty:
+        return
 
-with col2:
-    fig_vib = go.Figure()
-    fig_vib.add_trace(go.Scatter(x=vib_rms.index, y=vib_rms, name="RMS Real"))
-    fig_vib.add_trace(go.Scatter(x=ma_vib.index, y=ma_vib, name="Promedio", line=dict(dash="dash")))
-    if mask_vib.any():
-        fig_vib.add_trace(go.Scatter(x=vib_rms[mask_vib].index, y=vib_rms[mask_vib],
-                                      mode="markers", name="Anomalía", marker=dict(color="red", size=8)))
-    fig_vib.update_layout(title=f"Vibración RMS – Ventana {window} min")
-    st.plotly_chart(fig_vib, use_container_width=True)
+    st.markdown("## Análisis Predictivo")
+    window = st.slider("Ventana promedio móvil (min)", 5, 60, 15, key="predict_window")
+    fig_temp, fig_vib, n_anomalias = build_predictive(df, window)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(fig_temp, use_container_width=True, theme=None, config=PLOTLY_CONFIG)
+    with col2:
+        st.plotly_chart(fig_vib, use_container_width=True, theme=None, config=PLOTLY_CONFIG)
+
+    st.warning(f"Anomalías detectadas: {n_anomalias}")
 
-st.warning(f"Anomalías detectadas: {int(mask_temp.sum() + mask_vib.sum())}")
+
+predictive_section(range_hours)
 
 # -------------------------------------------------
 # RESUMEN ESTADÍSTICO
 # -------------------------------------------------
 st.markdown("## Resumen Estadístico")
-stats = df.describe().round(2).T
+# Cuatro reducciones NumPy sobre la matriz float32 (sumas acumuladas en float64).
+# Conteos explícitos y divisiones bajo np.errstate: las columnas sin datos quedan
+# en NaN sin avisos y sin tocar los filtros de warnings globales
+arr = df.to_numpy()
+valid = ~np.isnan(arr)
+n = valid.sum(axis=0)
+with np.errstate(invalid="ignore", divide="ignore"):
+    mean = np.nansum(arr, axis=0, dtype=np.float64) / n
+    dev = np.where(valid, arr - mean, 0.0)
+    std = np.where(n >= 2, np.sqrt((dev * dev).sum(axis=0) / (n - 1)), np.nan)
+stats = pd.DataFrame({
+    "mean": mean,
+    "std": std,
+    "min": np.fmin.reduce(arr, axis=0),
+    "max": np.fmax.reduce(arr, axis=0),
+}, index=df.columns).astype(np.float64).round(2)
 units = {
     "temperatura": "°C", "humedad": "%", "sensacion_termica": "°C",
     "accel_x": "g", "accel_y": "g", "accel_z": "g",
@@ -304,19 +511,25 @@ units = {
 stats["unidad"] = stats.index.map(units)
 st.dataframe(stats[["mean", "std", "min", "max", "unidad"]], use_container_width=True)
 
-# -------------------------------------------------
-# AUTO-REFRESH
-# -------------------------------------------------
-if auto_refresh:
-    time.sleep(30)
-    st.rerun()
-
 # -------------------------------------------------
 # FOOTER
 # -------------------------------------------------
-st.markdown("---")
-c1, c2 = st.columns(2)
-with c1:
-    st.markdown("**Proyecto Final – Digitalización de Plantas**")
-with c2:
-    st.markdown(f"**Última actualización:** {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+# La marca de actualización sólo cambia cuando llegan datos nuevos; va en un
+# fragmento para seguir a los datos que refresca el auto-refresh
+@st.fragment(run_every=refresh_every)
+def footer(range_hours):
+    df = get_data(range_hours)
+    last_time = df.index.max() if not df.empty else None
+    if "last_render" not in st.session_state or st.session_state.get("last_seen") != last_time:
+        st.session_state["last_seen"] = last_time
+        st.session_state["last_render"] = datetime.now()
+
+    st.markdown("---")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("**Proyecto Final – Digitalización de Plantas**")
+    with c2:
+        st.markdown(f"**Última actualización:** {st.session_state['last_render']:%d/%m/%Y %H:%M:%S}")
+
+
+footer(range_hours)